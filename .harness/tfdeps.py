@@ -10,8 +10,80 @@ Now includes ALL modules in output, regardless of dependencies.
 import os
 import re
 import sys
+import json
 import argparse
+import tempfile
+import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import blake2b
+
+# Precompiled patterns used on every scanned file
+# Block comments /* ... */ and single-line comments // and #, in one pass.
+# String literals are matched first so that a // or # inside a string is
+# not taken as a comment start; _strip_comment keeps them unchanged.
+_COMMENTS_RE = re.compile(
+    r'"(?:[^"\\\n]|\\.)*"|/\*.*?\*/|//[^\n]*|#[^\n]*', re.DOTALL)
+# First modules_dir directive inside a block comment; lazy so a match found
+# in a prefix of the file is the same match the whole file would give
+_MODULES_DIR_RE = re.compile(r'/\*.*?modules_dir:\s*([^\s*]+).*?\*/', re.DOTALL)
+# Module blocks, data source blocks and provider aliases, in one pass
+_BLOCKS_RE = re.compile(
+    r'module\s+"(?P<mod>[^"]+)"\s*\{'
+    r'|data\s+"[^"]+"\s+"(?P<data>[^"]+)"\s*\{'
+    r'|alias\s*=\s*"(?P<alias>[^"]+)"')
+# Data source name -> implied module: any "inner" -> inner_vpc, else any
+# "outer" -> outer_vpc, else the text before the first "_vpc" + "_vpc"
+_DATA_CLASSIFY_RE = re.compile(
+    r'(?P<inner>.*inner.*)|(?P<outer>.*outer.*)|(?P<prefix>(?:(?!_vpc).)+)_vpc.*',
+    re.DOTALL)
+
+# Bounds on how much of the HCL file is read looking for modules_dir
+_HCL_CHUNK_SIZE = 16 * 1024
+_HCL_READ_LIMIT = 128 * 1024
+
+# Files scanned for provider aliases
+_PROVIDER_FILES = ('provider.tf', 'versions.tf')
+
+# Per-file parse cache kept under the user's cache directory between runs.
+# Cached results depend on the entry layout and on the patterns and file
+# names below, so the version is derived from them; bump the leading
+# number when the layout of a cache entry changes.
+_CACHE_VERSION = blake2b(
+    repr((2, _COMMENTS_RE.pattern, _BLOCKS_RE.pattern, _PROVIDER_FILES)).encode('utf-8'),
+    digest_size=8).hexdigest()
+# Files changed this close to the start of a run are not cached: an edit
+# within the same timestamp tick (2 s on the coarsest filesystems) could
+# leave mtime, ctime and size all unchanged ("racy clean" in git terms)
+_CACHE_RACY_NS = 2 * 10**9
+
+
+def _strip_comment(match):
+    """Replacement for _COMMENTS_RE: drop comments, keep string literals."""
+    text = match.group()
+    return text if text[0] == '"' else ''
+
+
+def _read_full(entry):
+    """Read a file's text in a single os.read sized from its DirEntry stat.
+    
+    Skips the buffered text layer; the patterns treat \\r\\n and \\n line
+    endings alike.
+    """
+    size = entry.stat().st_size
+    flags = os.O_RDONLY | getattr(os, 'O_BINARY', 0) | getattr(os, 'O_CLOEXEC', 0)
+    fd = os.open(entry.path, flags)
+    try:
+        buf = os.read(fd, size)
+        # Short reads are rare for regular files but possible
+        while len(buf) < size:
+            more = os.read(fd, size - len(buf))
+            if not more:
+                break
+            buf += more
+    finally:
+        os.close(fd)
+    return buf.decode('utf-8')
 
 
 class TFDeps:
@@ -19,10 +91,18 @@ class TFDeps:
     
     def __init__(self, verbose=False):
         self.verbose = verbose
+        self.hcl_dir = None
         self.modules_dir = None
         self.dependencies = defaultdict(set)
         self.provider_aliases = defaultdict(set)
         self.all_modules = set()  # Track ALL modules found
+        self._cache = {}  # path -> ((mtime_ns, size), modules, data, aliases)
+        # The two caches below are written concurrently by the worker
+        # threads in run(). Each write is a single-key assignment, which
+        # is atomic in CPython; at worst two threads parse the same file.
+        self._next_cache = {}  # Entries seen this run, saved by save_cache
+        self._content_cache = {}  # content digest -> parsed blocks
+        self._cache_cutoff_ns = 0  # Only files older than this are cached
         
     def log(self, message):
         """Print verbose messages if enabled."""
@@ -31,31 +111,45 @@ class TFDeps:
     
     def remove_comments(self, content):
         """Remove all comments from Terraform content."""
-        # Remove block comments /* ... */
-        content = re.sub(r'/\*.*?\*/', '', content, flags=re.DOTALL)
-        # Remove single-line comments // and #
-        content = re.sub(r'//.*?$', '', content, flags=re.MULTILINE)
-        content = re.sub(r'#.*?$', '', content, flags=re.MULTILINE)
-        return content
+        # Most files have no comments; skip the regex pass entirely
+        if not ('#' in content or '//' in content or '/*' in content):
+            return content
+        return _COMMENTS_RE.sub(_strip_comment, content)
     
     def extract_modules_dir(self, hcl_file):
         """Extract modules_dir from HCL file block comment."""
+        # Look for modules_dir in block comments. The first directive is
+        # used, and it is usually near the top, so search a bounded prefix
+        # chunk by chunk first and only read and search the whole file when
+        # the prefix has no match.
+        content = ''
+        match = None
         try:
             with open(hcl_file, 'r') as f:
-                content = f.read()
+                while len(content) < _HCL_READ_LIMIT:
+                    chunk = f.read(_HCL_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    content += chunk
+                    match = _MODULES_DIR_RE.search(content)
+                    if match:
+                        break
+                else:
+                    rest = f.read()
+                    if rest:
+                        content += rest
+                        match = _MODULES_DIR_RE.search(content)
         except IOError as e:
             print(f"Error reading HCL file: {e}")
             return None
-            
-        # Look for modules_dir in block comments
-        pattern = r'/\*.*modules_dir:\s*([^\s*]+).*?\*/'
-        match = re.search(pattern, content, re.DOTALL)
         
         if match:
             path = match.group(1).strip()
             # Handle both relative and absolute paths
             if not os.path.isabs(path):
-                base_dir = os.path.dirname(os.path.abspath(hcl_file))
+                base_dir = self.hcl_dir
+                if base_dir is None:
+                    base_dir = os.path.dirname(os.path.abspath(hcl_file))
                 path = os.path.join(base_dir, path)
             return os.path.normpath(path)
         
@@ -63,7 +157,10 @@ class TFDeps:
         return None
     
     def scan_modules(self):
-        """Scan modules directory for ALL subdirectories."""
+        """Scan modules directory for ALL subdirectories.
+        
+        Returns the module directories as os.DirEntry objects sorted by name.
+        """
         if not self.modules_dir or not os.path.isdir(self.modules_dir):
             print(f"Error: Invalid modules directory: {self.modules_dir}")
             return []
@@ -72,16 +169,17 @@ class TFDeps:
         
         modules = []
         try:
-            items = os.listdir(self.modules_dir)
-            self.log(f"Found {len(items)} items in directory")
+            with os.scandir(self.modules_dir) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+            self.log(f"Found {len(entries)} items in directory")
             
-            for item in sorted(items):
-                item_path = os.path.join(self.modules_dir, item)
-                if os.path.isdir(item_path) and not item.startswith('.'):
-                    modules.append(item)
+            for entry in entries:
+                item = entry.name
+                if not item.startswith('.') and entry.is_dir():
+                    modules.append(entry)
                     self.log(f"Found module: {item}")
-                    self.all_modules.add(item)  # Track ALL modules
-                elif os.path.isfile(item_path):
+                    self.all_modules.add(sys.intern(item))  # Track ALL modules
+                elif entry.is_file():
                     self.log(f"Skipping file (not a module): {item}")
                 elif item.startswith('.'):
                     self.log(f"Skipping hidden item: {item}")
@@ -91,172 +189,221 @@ class TFDeps:
             return []
         
         self.log(f"Total modules detected: {len(modules)}")
-        return sorted(modules)
+        return modules
     
-    def extract_provider_aliases(self, module_path):
-        """Extract provider aliases from provider.tf or versions.tf files."""
-        aliases = set()
-        
-        for filename in ['provider.tf', 'versions.tf']:
-            file_path = os.path.join(module_path, filename)
-            if not os.path.isfile(file_path):
-                continue
-                
-            try:
-                with open(file_path, 'r') as f:
-                    content = f.read()
-                content = self.remove_comments(content)
-                
-                # Find alias patterns
-                alias_matches = re.findall(r'alias\s*=\s*"([^"]+)"', content)
-                aliases.update(alias_matches)
-                
-                self.log(f"Found aliases in {filename}: {alias_matches}")
-                
-            except IOError as e:
-                self.log(f"Error reading {filename}: {e}")
-                continue
-        
-        return aliases
+    def _cache_path(self):
+        """Return the cache file used for the current modules directory."""
+        cache_home = (os.environ.get('XDG_CACHE_HOME')
+                      or os.path.join(os.path.expanduser('~'), '.cache'))
+        key = blake2b(os.fsencode(os.path.abspath(self.modules_dir)),
+                      digest_size=16).hexdigest()
+        return os.path.join(cache_home, 'tfdeps', f"{key}.json")
     
-    def extract_explicit_dependencies(self, module_path):
-        """Extract explicit module dependencies from module blocks."""
-        dependencies = set()
+    def load_cache(self):
+        """Load the per-file parse cache left by a previous run."""
+        cache_path = self._cache_path()
+        try:
+            with open(cache_path, 'r') as f:
+                data = json.load(f)
+            if data['version'] != _CACHE_VERSION:
+                return
+            # Intern names here so warm runs get the same benefit as cold ones
+            files = {
+                path: (tuple(key),
+                       [sys.intern(name) for name in modules],
+                       [sys.intern(name) for name in data_blocks],
+                       [sys.intern(name) for name in aliases])
+                for path, (key, modules, data_blocks, aliases) in data['files'].items()
+            }
+        except FileNotFoundError:
+            return
+        except (IOError, ValueError, TypeError, KeyError) as e:
+            self.log(f"Ignoring unreadable cache {cache_path}: {e}")
+            return
         
-        # Look for all .tf files
+        self._cache = files
+        self.log(f"Loaded {len(files)} cached file entries")
+    
+    def save_cache(self):
+        """Save parse results for the files seen in this run."""
+        cache_path = self._cache_path()
+        cache_dir = os.path.dirname(cache_path)
+        tmp_path = None
         try:
-            tf_files = [f for f in os.listdir(module_path) if f.endswith('.tf')]
-        except OSError:
-            return dependencies
+            os.makedirs(cache_dir, exist_ok=True)
+            # Unique temp name so concurrent runs don't clobber each other
+            with tempfile.NamedTemporaryFile('w', dir=cache_dir, prefix='.tmp-',
+                                             suffix='.json', delete=False) as f:
+                tmp_path = f.name
+                json.dump({'version': _CACHE_VERSION, 'files': self._next_cache}, f)
+            os.replace(tmp_path, cache_path)
+        except IOError as e:
+            self.log(f"Error writing cache {cache_path}: {e}")
+            if tmp_path:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+    
+    def _parse_tf_file(self, entry):
+        """Return (module_blocks, data_blocks, alias_matches) for a .tf file.
         
-        for tf_file in tf_files:
-            file_path = os.path.join(module_path, tf_file)
-            try:
-                with open(file_path, 'r') as f:
-                    content = f.read()
-                content = self.remove_comments(content)
-                
-                # Find module blocks
-                module_blocks = re.findall(r'module\s+"([^"]+)"\s*\{', content)
-                dependencies.update(module_blocks)
-                
-                if module_blocks:
-                    self.log(f"Found explicit dependencies in {tf_file}: {module_blocks}")
-                    
-            except IOError as e:
-                self.log(f"Error reading {tf_file}: {e}")
-                continue
+        Results are reused from the cache while the file's mtime, ctime,
+        size and inode are unchanged, and shared between files whose stripped content is
+        identical. The returned lists must not be modified.
+        
+        Called from worker threads; writes to self._next_cache and
+        self._content_cache are single-key assignments only.
+        """
+        st = entry.stat()
+        key = (st.st_mtime_ns, st.st_ctime_ns, st.st_size, st.st_ino)
+        cached = self._cache.get(entry.path)
+        if cached is not None and cached[0] == key:
+            self._next_cache[entry.path] = cached
+            return cached[1:]
+        
+        content = self.remove_comments(_read_full(entry))
         
-        return dependencies
+        # Identical files (copied provider.tf etc.) are only scanned once
+        digest = blake2b(content.encode('utf-8'), digest_size=16).digest()
+        parsed = self._content_cache.get(digest)
+        if parsed is None:
+            parsed = {'mod': [], 'data': [], 'alias': []}
+            # Names end up as dict keys and set members; intern them so
+            # repeated lookups compare by identity first
+            for match in _BLOCKS_RE.finditer(content):
+                parsed[match.lastgroup].append(sys.intern(match[match.lastgroup]))
+            self._content_cache[digest] = parsed
+        
+        module_blocks = parsed['mod']
+        data_blocks = parsed['data']
+        alias_matches = parsed['alias']
+        if entry.name not in _PROVIDER_FILES:
+            alias_matches = []
+        
+        if max(st.st_mtime_ns, st.st_ctime_ns) < self._cache_cutoff_ns:
+            self._next_cache[entry.path] = (key, module_blocks, data_blocks, alias_matches)
+        return module_blocks, data_blocks, alias_matches
     
-    def extract_implicit_dependencies(self, module_path):
-        """Extract implicit dependencies from data sources."""
-        dependencies = set()
+    def _extract_deps(self, module_path):
+        """Extract dependencies and provider aliases in a single pass over .tf files.
+        
+        Returns an (explicit, implicit, aliases) tuple of sets. Aliases are
+        only taken from provider.tf and versions.tf.
+        """
+        explicit = set()
+        implicit = set()
+        aliases = set()
         
         # Look for all .tf files
         try:
-            tf_files = [f for f in os.listdir(module_path) if f.endswith('.tf')]
+            with os.scandir(module_path) as it:
+                tf_entries = [entry for entry in it
+                              if entry.name.endswith('.tf') and entry.is_file()]
         except OSError:
-            return dependencies
+            return explicit, implicit, aliases
         
-        for tf_file in tf_files:
-            file_path = os.path.join(module_path, tf_file)
+        for entry in tf_entries:
+            tf_file = entry.name
             try:
-                with open(file_path, 'r') as f:
-                    content = f.read()
-                content = self.remove_comments(content)
-                
-                # Find data source blocks
-                data_blocks = re.findall(r'data\s+"[^"]+"\s+"([^"]+)"\s*\{', content)
-                
-                for data_name in data_blocks:
-                    module_name = None
-                    
-                    # Check for VPC patterns
-                    if '_vpc' in data_name:
-                        if 'inner' in data_name:
-                            module_name = 'inner_vpc'
-                        elif 'outer' in data_name:
-                            module_name = 'outer_vpc'
-                        else:
-                            # Extract prefix before _vpc
-                            prefix = data_name.split('_vpc')[0]
-                            if prefix:
-                                module_name = f"{prefix}_vpc"
-                    
-                    # Check for inner/outer patterns
-                    elif 'inner' in data_name:
-                        module_name = 'inner_vpc'
-                    elif 'outer' in data_name:
-                        module_name = 'outer_vpc'
-                    
-                    if module_name:
-                        dependencies.add(module_name)
-                        self.log(f"Found implicit dependency: {data_name} -> {module_name}")
-                        
+                module_blocks, data_blocks, alias_matches = self._parse_tf_file(entry)
             except IOError as e:
                 self.log(f"Error reading {tf_file}: {e}")
                 continue
+            
+            # Collect alias patterns
+            if tf_file in _PROVIDER_FILES:
+                aliases.update(alias_matches)
+                
+                self.log(f"Found aliases in {tf_file}: {alias_matches}")
+            
+            # Collect module blocks
+            explicit.update(module_blocks)
+            
+            if module_blocks:
+                self.log(f"Found explicit dependencies in {tf_file}: {module_blocks}")
+            
+            # Classify data source blocks
+            for data_name in data_blocks:
+                match = _DATA_CLASSIFY_RE.fullmatch(data_name)
+                if match is None:
+                    continue
+                
+                if match.lastgroup == 'prefix':
+                    module_name = f"{match['prefix']}_vpc"
+                else:
+                    module_name = f"{match.lastgroup}_vpc"
+                
+                implicit.add(sys.intern(module_name))
+                self.log(f"Found implicit dependency: {data_name} -> {module_name}")
         
-        return dependencies
+        return explicit, implicit, aliases
     
-    def analyze_module(self, module_name):
-        """Analyze a single module for dependencies and provider aliases."""
-        module_path = os.path.join(self.modules_dir, module_name)
+    def _analyze_module_pure(self, module_entry):
+        """Analyze a single module on a worker thread.
         
-        self.log(f"Processing module: {module_name}")
+        Returns a (module_name, aliases, deps) tuple for run() to merge;
+        dependencies and aliases are not written to shared state here. The
+        parse caches are, see _parse_tf_file.
+        """
+        module_name = sys.intern(module_entry.name)
         
-        # Extract provider aliases
-        aliases = self.extract_provider_aliases(module_path)
-        for alias in aliases:
-            self.provider_aliases[alias].add(module_name)
+        self.log(f"Processing module: {module_name}")
         
-        # Extract dependencies
-        explicit_deps = self.extract_explicit_dependencies(module_path)
-        implicit_deps = self.extract_implicit_dependencies(module_path)
+        # Extract dependencies and provider aliases
+        explicit_deps, implicit_deps, aliases = self._extract_deps(module_entry.path)
         all_deps = explicit_deps.union(implicit_deps)
         
         # Remove self-references
         all_deps.discard(module_name)
         
-        for dep in all_deps:
-            self.dependencies[module_name].add(dep)
-        
         self.log(f"Dependencies for {module_name}: {sorted(all_deps)}")
+        return module_name, aliases, all_deps
     
-    def generate_output(self, hcl_file):
+    def generate_output(self, hcl_file=None):
         """Generate dependencies.txt output file including ALL modules."""
-        output_lines = ["/*"]
-        output_lines.append("MODULES:")
-        
         # Include ALL modules found, not just those with dependencies
-        for module in sorted(self.all_modules):
-            deps = sorted(self.dependencies.get(module, []))
-            if deps:
-                output_lines.append(f"- {module} (depends_on: {', '.join(deps)})")
-            else:
-                output_lines.append(f"- {module}")
+        module_lines = [
+            f"- {module} (depends_on: {', '.join(sorted(self.dependencies[module]))})"
+            if self.dependencies.get(module) else f"- {module}"
+            for module in sorted(self.all_modules)
+        ]
         
         # Add provider aliases
-        for alias in sorted(self.provider_aliases.keys()):
-            output_lines.append(f"")
-            output_lines.append(f"PROVIDER {alias}:")
-            for module in sorted(self.provider_aliases[alias]):
-                output_lines.append(f"- {module}")
+        alias_lines = [
+            line
+            for alias in sorted(self.provider_aliases)
+            for line in ("", f"PROVIDER {alias}:",
+                         *[f"- {module}" for module in sorted(self.provider_aliases[alias])])
+        ]
         
-        output_lines.append("*/")
+        payload = '\n'.join(
+            ["/*", "MODULES:", *module_lines, *alias_lines, "*/"]).encode('utf-8')
         
-        # Write to file
-        output_file = os.path.join(os.path.dirname(os.path.abspath(hcl_file)), 'dependencies.txt')
+        # Write to file with a single raw write in the common case
+        base_dir = self.hcl_dir
+        if base_dir is None:
+            base_dir = os.path.dirname(os.path.abspath(hcl_file))
+        output_file = os.path.join(base_dir, 'dependencies.txt')
         try:
-            with open(output_file, 'w') as f:
-                f.write('\n'.join(output_lines))
+            flags = (os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+                     | getattr(os, 'O_BINARY', 0))
+            fd = os.open(output_file, flags, 0o666)
+            try:
+                view = memoryview(payload)
+                while view:
+                    view = view[os.write(fd, view):]
+            finally:
+                os.close(fd)
             print(f"Successfully generated {output_file}")
         except IOError as e:
             print(f"Error writing output file: {e}")
     
     def run(self, hcl_file):
         """Main execution method."""
+        # Resolve the HCL file's directory once; paths are relative to it
+        self.hcl_dir = os.path.dirname(os.path.abspath(hcl_file))
+        
         # Extract modules directory
         self.modules_dir = self.extract_modules_dir(hcl_file)
         if not self.modules_dir:
@@ -268,9 +415,27 @@ class TFDeps:
             print("No modules found to analyze")
             return 1
         
-        # Analyze each module
-        for module in modules:
-            self.analyze_module(module)
+        self._cache_cutoff_ns = time.time_ns() - _CACHE_RACY_NS
+        self.load_cache()
+        
+        # Analyze modules concurrently; the work is dominated by file I/O
+        max_workers = min(32, (os.cpu_count() or 4) * 4)
+        with ThreadPoolExecutor(max_workers=max_workers) as ex:
+            results = list(ex.map(self._analyze_module_pure, modules))
+        
+        # Merge results serially so workers never touch shared state;
+        # modules are grouped per alias and each alias set built once
+        alias_modules = defaultdict(list)
+        for module_name, aliases, deps in results:
+            for alias in aliases:
+                alias_modules[alias].append(module_name)
+            if deps:
+                self.dependencies[module_name].update(deps)
+        self.provider_aliases = defaultdict(set, {
+            alias: set(names) for alias, names in alias_modules.items()
+        })
+        
+        self.save_cache()
         
         # Generate output - now includes ALL modules
         self.generate_output(hcl_file)